@@ -28,6 +28,8 @@ from tinydb import Query, TinyDB, JSONStorage
 from tinydb.operations import set as db_set
 from websockets.exceptions import ConnectionClosed
 
+from poll_store import PollStatusStore
+
 
 # simple FileLock extension to tinydb to protect read/writes
 class FileLockingStorage(JSONStorage):
@@ -143,7 +145,7 @@ def _now():
 
 
 def _hash(new_payload, key="status"):
-    database = poll_status.get(Query().key == key) or {}
+    database = poll_status.get(key)
     new_hash = hash("".join(new_payload))
     old_hash = hash("".join(database.get("payload") or ["checking..."]))
     return (new_hash == old_hash)
@@ -211,7 +213,16 @@ async def startup():
     am_settings = users.table('am_settings')
     gu_settings = users.table('gu_settings')
     valheim_mods = users.table('valheim_mods')
-    poll_status = users.table('poll_status')
+    poll_status = PollStatusStore(os.getenv('POLL_STATUS_DB') or 'poll_status.db')
+    with users.storage.lock: # hold db.json.lock across the read-modify-write, other workers start concurrently
+        if 'poll_status' in users.tables():
+            # migrate away from the old db.json table, keeping the autoshutdown timer and last payloads
+            for d in users.table('poll_status').all():
+                if d.get('time'):
+                    poll_status.touch(d['key'], d['time'])
+                if d.get('payload'):
+                    poll_status.set_payload(d['key'], d.get('updated') or [_now()], poll_status.cap(d['payload']))
+            users.drop_table('poll_status')
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
     logger.info('end startup')
@@ -234,8 +245,9 @@ async def autoshutdown_server():
 
         if len(rval) > 1 and "No Players Connected" in rval[1]:
 
-            Poll = Query()
-            db_key = poll_status.get(Poll.key == 'autoshutdown') or {}
+            db_key = poll_status.get('autoshutdown')
+            if not db_key.get("time"):
+                poll_status.touch('autoshutdown') # fresh store, start counting idle time now
             t = db_key.get("time") or time.time()
 
             if time.time() - t > (60*60):
@@ -251,8 +263,7 @@ async def autoshutdown_server():
     else:
         logger.info("server not running, reset autoshutdown timer")
 
-    Poll = Query()
-    poll_status.upsert({"key":'autoshutdown', "time":time.time()}, Poll.key == 'autoshutdown')
+    poll_status.touch('autoshutdown')
     
 
 @app.get("/api/status", dependencies=[Depends(authorize)])
@@ -406,8 +417,7 @@ async def websocket_poll(websocket, key="status"):
     await websocket.accept()
     logger.info("accepted client on %s: %s %s" % (websocket.url, ws_username(websocket), websocket.client.host))
     logger.info('begin websocket_poll on %s', key)
-    Poll = Query()
-    db_key = poll_status.get(Poll.key == key) or {}
+    db_key = poll_status.get(key)
 
     updated = db_key.get("updated") or [_now()]
     payload = db_key.get("payload") or ["checking..."]
@@ -419,11 +429,11 @@ async def websocket_poll(websocket, key="status"):
     while True:
         await asyncio.sleep(5)
 
-        db_key = poll_status.get(Poll.key == key) or {}
+        db_key = poll_status.get(key)
         time_now = time.time()
 
-        if not db_key or (time_now - db_key["time"]) > 5:
-            poll_status.update({"time":time.time()}, Poll.key == key)            
+        if not db_key.get("time") or (time_now - db_key["time"]) > 5:
+            poll_status.touch(key)
 
             cmd = 'docker exec -i ark arkmanager status | aha --no-header'
 
@@ -438,11 +448,12 @@ async def websocket_poll(websocket, key="status"):
             rval = []
             async for l in get_lines(cmd):
                 rval.append(l.decode())
+            rval = poll_status.cap(rval)
 
             if not _hash(rval, key):
                 db_key["updated"] = [_now()]
                 db_key["payload"] = rval
-                poll_status.upsert({"key":key, "updated": db_key["updated"], "payload": db_key["payload"]}, Poll.key == key)
+                poll_status.set_payload(key, db_key["updated"], db_key["payload"])
 
         updated = db_key.get("updated") or [_now()]
         payload = db_key.get("payload") or ["checking..."]
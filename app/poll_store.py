@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import time
+
+
+# volatile websocket poll state, kept out of db.json so the 5 second heartbeats
+# don't rewrite the users/settings tables. sqlite in WAL mode lets every gunicorn
+# worker share it, and each heartbeat is a single row update.
+class PollStatusStore:
+    MAX_PAYLOAD_LINES = 200
+    MAX_PAYLOAD_BYTES = 64 * 1024
+    CUT_MARKER = "…"
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA journal_size_limit=%d" % (1024 * 1024))
+        self.conn.execute("CREATE TABLE IF NOT EXISTS poll_status "
+                          "(key TEXT PRIMARY KEY, time REAL, updated TEXT, payload TEXT)")
+
+    def get(self, key):
+        row = self.conn.execute("SELECT time, updated, payload FROM poll_status WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return {}
+        return {
+            "key": key,
+            "time": row[0],
+            "updated": json.loads(row[1]) if row[1] else None,
+            "payload": json.loads(row[2]) if row[2] else None
+        }
+
+    def touch(self, key, t=None):
+        self.conn.execute("INSERT INTO poll_status (key, time) VALUES (?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET time = excluded.time",
+                          (key, time.time() if t is None else t))
+
+    def set_payload(self, key, updated, payload):
+        # compact separators, cap() budgets 1 byte per separator
+        self.conn.execute("INSERT INTO poll_status (key, updated, payload) VALUES (?, ?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET updated = excluded.updated, payload = excluded.payload",
+                          (key, json.dumps(updated), json.dumps(payload, separators=(',', ':'))))
+
+    def cap(self, payload):
+        # keep the newest lines that fit the byte budget, cutting the oldest kept line
+        # to fit rather than dropping it, so non-empty output never caps to []
+        budget = self.MAX_PAYLOAD_BYTES - 2 # enclosing []
+        capped = []
+        for line in reversed(payload[-self.MAX_PAYLOAD_LINES:]):
+            size = len(json.dumps(line)) + 1 # separator
+            if size > budget:
+                cut = self._cut(line, budget - 1)
+                if cut:
+                    capped.append(cut)
+                break
+            capped.append(line)
+            budget -= size
+        capped.reverse()
+        return capped
+
+    def _cut(self, line, budget):
+        # keep the head of line so json.dumps(cut) fits budget, ending in CUT_MARKER.
+        # the kept text is cut off, backed up so it doesn't end inside an aha tag or entity
+        room = budget - len(json.dumps(self.CUT_MARKER)) # marker plus both quotes
+        if room < 0:
+            return ""
+        head = line[:room]
+        if len(json.dumps(head)) - 2 > room:
+            # escapes widen some chars, one pass summing each char's encoded width
+            used = 0
+            for i, ch in enumerate(head):
+                used += len(json.dumps(ch)) - 2
+                if used > room:
+                    head = head[:i]
+                    break
+        lt = head.rfind('<')
+        if lt > head.rfind('>'):
+            head = head[:lt]
+        amp = head.rfind('&')
+        if amp > head.rfind(';') and not any(c.isspace() for c in head[amp:]):
+            head = head[:amp]
+        return head + self.CUT_MARKER
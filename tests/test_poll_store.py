@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from poll_store import PollStatusStore
+
+
+def _store(tmp_path):
+    return PollStatusStore(str(tmp_path / "poll_status.db"))
+
+
+def _stored_size(store, key):
+    return len(store.conn.execute("SELECT payload FROM poll_status WHERE key = ?", (key,)).fetchone()[0])
+
+
+def test_cap_keeps_newest_lines(tmp_path):
+    store = _store(tmp_path)
+    capped = store.cap([f"line {i}" for i in range(300)])
+    assert len(capped) == store.MAX_PAYLOAD_LINES
+    assert capped[-1] == "line 299"
+    assert store.cap([]) == []
+
+
+def test_cap_stays_under_byte_limit(tmp_path):
+    store = _store(tmp_path)
+    payloads = [
+        ["b" * 1000] * 100,
+        ["y" * 60000] * 200,
+        ["x" * 70000],
+        ["a", 'bé"' * 30000],
+        ["\U0001F600" * 40000],
+        ["q" * 100, "w" * 65533],
+    ]
+    for payload in payloads:
+        capped = store.cap(payload)
+        assert capped
+        store.set_payload("status", ["now"], capped)
+        assert _stored_size(store, "status") <= store.MAX_PAYLOAD_BYTES
+        assert store.get("status")["payload"] == capped
+
+
+def test_cap_cuts_oversized_line(tmp_path):
+    store = _store(tmp_path)
+    capped = store.cap(["x" * 70000])
+    assert len(capped) == 1
+    assert capped[0].endswith(store.CUT_MARKER)
+    assert capped[0].startswith("x" * 1000)
+
+
+def test_cut_does_not_split_tags_or_entities(tmp_path):
+    store = _store(tmp_path)
+    budget = len(json.dumps(store.CUT_MARKER)) + 12
+    assert store._cut('ab<span style="color:red">', budget) == "ab" + store.CUT_MARKER
+    assert store._cut("ab&amp;cd&amp;", budget) == "ab&amp;cd" + store.CUT_MARKER
+    assert store._cut("x", 2) == ""
+
+
+def test_touch_and_get(tmp_path):
+    store = _store(tmp_path)
+    assert store.get("autoshutdown") == {}
+    store.touch("autoshutdown", 123.0)
+    assert store.get("autoshutdown")["time"] == 123.0
+    store.set_payload("autoshutdown", ["now"], ["ok"])
+    assert store.get("autoshutdown")["time"] == 123.0